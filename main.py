@@ -4,6 +4,9 @@ import requests
 import time
 import re
 import os
+import math
+import queue
+import threading
 
 from PyQt5.QtCore import QThread, pyqtSignal, Qt
 from PyQt5.QtWidgets import (
@@ -15,6 +18,11 @@ from PyQt5.QtWidgets import (
 MODEL = "qwen2.5:3b-instruct"
 OLLAMA_URL = "http://localhost:11434/api/generate"
 
+# Pipeline a due stadi: generazione primaria + riscritture di lunghezza.
+# Richieste contemporanee a Ollama = somma dei due (vedi OLLAMA_NUM_PARALLEL).
+PRIMARY_CONCURRENCY = 1
+REWRITE_CONCURRENCY = 1
+
 # Indici di colonna IN INPUT (0-based)
 COL_TITLE_IN = 4   # colonna E -> Titolo prodotto
 COL_DESC_IN = 9    # colonna J -> Descrizione prodotto
@@ -25,6 +33,19 @@ YOAST_TITLE_HEADER   = "Meta: _yoast_wpseo_title"
 YOAST_DESC_HEADER    = "Meta: _yoast_wpseo_metadesc"
 LONG_DESC_HEADER = "Descrizione"   # ✅ descrizione lunga WooCommerce (colonna CSV)
 
+# Colonne WooCommerce usate per la priorità di elaborazione
+PUBLISHED_HEADER  = "Pubblicato"
+IN_STOCK_HEADER   = "In stock?"
+CATEGORIES_HEADER = "Categorie"
+
+# Pesi della priorità (più alto = elaborato prima)
+PRIORITY_PUBLISHED    = 100
+PRIORITY_IN_STOCK     = 50
+PRIORITY_KEY_CATEGORY = 25
+
+# Ogni quante righe completate riscrivere il CSV di output (checkpoint)
+CHECKPOINT_EVERY = 10
+
 
 # Range desiderato per la meta description
 MIN_DESC_LEN = 120
@@ -278,17 +299,19 @@ def build_fallback_description(nome_prodotto: str) -> str:
     )
     return base
 
-def enforce_meta_description_length(desc: str, nome_prodotto: str, logger=None) -> str:
+def prepare_meta_description(desc: str, nome_prodotto: str):
+    """Pulizia + fallback; restituisce (desc, serve_riscrittura) senza chiamare il modello."""
     desc = clean_text(desc or "")
     desc = finalize_description(desc)
 
     if not desc:
         desc = build_fallback_description(nome_prodotto)
-        return finalize_description(desc)
+        return finalize_description(desc), False
 
-    if MIN_DESC_LEN <= len(desc) <= MAX_DESC_LEN:
-        return desc
+    return desc, not (MIN_DESC_LEN <= len(desc) <= MAX_DESC_LEN)
 
+def rewrite_meta_description(desc: str, nome_prodotto: str, logger=None) -> str:
+    """Seconda chiamata al modello per riportare la description nel range 120–150."""
     # Riscrittura tramite modello (ma poi comunque applichiamo finalize_description)
     prompt = f"""
 Sei uno specialista SEO per e-commerce B2B.
@@ -351,6 +374,49 @@ Rispondi SOLO con la nuova meta description, in UNA sola riga, senza prefissi ti
 
     return new_desc
 
+# ---------------- PRIORITÀ ----------------
+
+def find_col(header, hname: str):
+    """Indice della colonna (None se assente, senza aggiungerla)."""
+    try:
+        return header.index(hname)
+    except ValueError:
+        return None
+
+def normalize_category_path(text: str) -> str:
+    """Percorso categoria normalizzato: "Padre>Figlio " -> "padre > figlio"."""
+    parts = [p.strip() for p in (text or "").lower().split(">")]
+    return " > ".join(p for p in parts if p)
+
+def parse_key_categories(text: str):
+    """Categorie prioritarie da GUI: separate da virgola o a capo, nome singolo o percorso "A > B"."""
+    paths = [normalize_category_path(p) for p in re.split(r"[,\n]", text or "")]
+    return [p for p in paths if p]
+
+def row_priority(row, published_idx, in_stock_idx, categories_idx, key_categories) -> int:
+    """Punteggio di priorità della riga: pubblicato, disponibile, in una categoria chiave."""
+    def cell(idx):
+        if idx is None or idx >= len(row):
+            return ""
+        return (row[idx] or "").strip().lower()
+
+    score = 0
+    if cell(published_idx) == "1":
+        score += PRIORITY_PUBLISHED
+    if cell(in_stock_idx) == "1":
+        score += PRIORITY_IN_STOCK
+    # Woo esporta "Padre > Figlio, Altra > Sotto": confronto su nomi interi o percorsi
+    # (anche parziali dalla radice, così "Padre > Figlio" copre le sue sottocategorie),
+    # mai su sottostringhe
+    categorie = set()
+    for path in cell(categories_idx).split(","):
+        parts = [p for p in normalize_category_path(path).split(" > ") if p]
+        categorie.update(parts)
+        categorie.update(" > ".join(parts[:k]) for k in range(2, len(parts) + 1))
+    if categorie and any(kc in categorie for kc in key_categories):
+        score += PRIORITY_KEY_CATEGORY
+    return score
+
 # TEMPLATE FISSO DEL PROMPT (NON EDITABILE DA GUI)
 BASE_PROMPT = """Sei uno specialista SEO per e-commerce B2B.
 
@@ -389,12 +455,13 @@ DESCRIPTION: <meta description qui, in una sola riga>
 Non aggiungere altre righe, testo o simboli.
 """
 
-def genera_meta(nome_prodotto: str, descrizione: str, prompt_template: str, logger=None):
+def genera_meta_primaria(nome_prodotto: str, descrizione: str, prompt_template: str, logger=None):
+    """Solo generazione primaria: restituisce (title, desc, serve_riscrittura)."""
     testo_nome = nome_prodotto.strip() if nome_prodotto else ""
     testo_desc = descrizione.strip() if descrizione else ""
 
     if not testo_nome and not testo_desc:
-        return "", ""
+        return "", "", False
 
     contesto = f"Nome prodotto: {testo_nome}\nDescrizione: {testo_desc}"
     prompt = prompt_template.format(contesto=contesto)
@@ -418,12 +485,12 @@ def genera_meta(nome_prodotto: str, descrizione: str, prompt_template: str, logg
         msg = f"⏱ Timeout da Ollama (>{200}s) per prodotto: {testo_nome[:40]!r}, salto questa riga."
         if logger: logger(msg)
         else: print(msg)
-        return "", ""
+        return "", "", False
     except Exception as e:
         msg = f"⚠ Errore chiamata Ollama per {testo_nome[:40]!r}: {e}"
         if logger: logger(msg)
         else: print(msg)
-        return "", ""
+        return "", "", False
 
     elapsed = time.time() - start
     msg = f"✅ Risposta Ollama in {elapsed:.1f} secondi per: {testo_nome[:40]!r}"
@@ -452,27 +519,55 @@ def genera_meta(nome_prodotto: str, descrizione: str, prompt_template: str, logg
         else:
             print(msg)
             print(raw[:300])
-        return "", ""
+        return "", "", False
 
     title = clean_text(title)
     title = hard_trim(title, 60)
     title = limit_title_words(title, max_content_words=4)
 
-    desc = enforce_meta_description_length(desc, testo_nome, logger=logger)
+    desc, needs_rewrite = prepare_meta_description(desc, testo_nome)
+
+    return title, desc, needs_rewrite
+
+class StageStats:
+    """Contatori thread-safe di uno stadio della pipeline (chiamate e tempo speso)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.busy_s = 0.0
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.busy_s += seconds
+
+    def avg_s(self) -> float:
+        with self._lock:
+            return self.busy_s / self.count if self.count else 0.0
 
-    return title, desc
+    def per_minute(self, elapsed_s: float) -> float:
+        return self.count * 60.0 / elapsed_s if elapsed_s > 0 else 0.0
 
 class SeoWorker(QThread):
     log_signal = pyqtSignal(str)
     finished_signal = pyqtSignal(str)
     error_signal = pyqtSignal(str)
 
-    def __init__(self, input_csv, output_csv, prompt_template, parent=None):
+    def __init__(self, input_csv, output_csv, prompt_template,
+                 key_categories=None, time_budget_s=None, parent=None):
         super().__init__(parent)
         self.input_csv = input_csv
         self.output_csv = output_csv
         self.prompt_template = prompt_template
+        self.key_categories = key_categories or []
+        self.time_budget_s = time_budget_s   # None = nessun limite
         self._stop = False
+        self._lock = threading.Lock()
+        self._deadline = None
+        self._budget_hit = False
+        self._rewrites_skipped = 0
+        self._errors = []
 
     def stop(self):
         self._stop = True
@@ -480,6 +575,109 @@ class SeoWorker(QThread):
     def log(self, msg: str):
         self.log_signal.emit(msg)
 
+    def _may_start_call(self, stage: str, stats: StageStats) -> bool:
+        """False se c'è uno stop o se la prossima chiamata (in media) sforerebbe il budget.
+
+        Il budget esaurito in uno stadio ferma entrambi gli stadi.
+        """
+        if self._stop or self._budget_hit:
+            return False
+        if self._deadline is None:
+            return True
+        if time.time() + stats.avg_s() <= self._deadline:
+            return True
+        with self._lock:
+            first = not self._budget_hit
+            self._budget_hit = True
+        if first:
+            self.log(f"⏱ Budget tempo esaurito (stadio {stage}): nessuna nuova chiamata al modello.")
+        return False
+
+    def _guarded(self, target, *args):
+        # un'eccezione in uno stadio ferma tutta la pipeline e arriva a error_signal
+        try:
+            target(*args)
+        except Exception as e:
+            with self._lock:
+                self._errors.append(e)
+            self._stop = True
+
+    def _primary_stage(self, data_rows, primary_q, rewrite_q, done_q, stats):
+        """Stadio 1: generazione primaria; le righe fuori range vanno in coda riscritture."""
+        while self._may_start_call("primaria", stats):
+            try:
+                prio, j = primary_q.get_nowait()
+            except queue.Empty:
+                return
+
+            row = data_rows[j]
+            nome = row[COL_TITLE_IN] if len(row) > COL_TITLE_IN else ""
+            descr = row[COL_DESC_IN] if len(row) > COL_DESC_IN else ""
+
+            start = time.time()
+            title, desc, needs_rewrite = genera_meta_primaria(nome, descr, self.prompt_template, logger=self.log)
+            stats.add(time.time() - start)
+
+            if needs_rewrite:
+                rewrite_q.put((prio, j, title, desc))
+            else:
+                done_q.put((j, title, desc))
+
+    def _rewrite_stage(self, data_rows, rewrite_q, done_q, primary_done, stats):
+        """Stadio 2: riscritture di lunghezza, finché lo stadio primario non ha finito."""
+        while True:
+            try:
+                prio, j, title, desc = rewrite_q.get(timeout=0.2)
+            except queue.Empty:
+                if primary_done.is_set():
+                    return
+                continue
+
+            if self._may_start_call("riscritture", stats):
+                row = data_rows[j]
+                nome = row[COL_TITLE_IN] if len(row) > COL_TITLE_IN else ""
+                start = time.time()
+                desc = rewrite_meta_description(desc, nome.strip(), logger=self.log)
+                stats.add(time.time() - start)
+            else:
+                # stop/budget: la riga esce con la description della generazione primaria
+                with self._lock:
+                    self._rewrites_skipped += 1
+
+            done_q.put((j, title, desc))
+
+    def _write_output(self, header, data_rows, dialect):
+        """Scrive l'output su file temporaneo e lo sostituisce a quello finale (mai mezzo file)."""
+        tmp_path = self.output_csv + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8", newline="") as f_out:
+                writer = csv.writer(
+                    f_out,
+                    delimiter=getattr(dialect, "delimiter", ";"),
+                    quotechar=getattr(dialect, "quotechar", '"'),
+                    quoting=csv.QUOTE_MINIMAL
+                )
+
+                writer.writerow(header)
+                writer.writerows(data_rows)
+            os.replace(tmp_path, self.output_csv)
+        except Exception:
+            # niente .tmp orfani se la scrittura o la sostituzione falliscono
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _pipeline_status(self, primary_q, rewrite_q, primary_stats, rewrite_stats, elapsed_s) -> str:
+        return (
+            f"Code: primaria {primary_q.qsize()}, riscritture {rewrite_q.qsize()} | "
+            f"primaria {primary_stats.count} ({primary_stats.per_minute(elapsed_s):.1f}/min, "
+            f"{primary_stats.avg_s():.1f}s medi) | "
+            f"riscritture {rewrite_stats.count} ({rewrite_stats.per_minute(elapsed_s):.1f}/min, "
+            f"{rewrite_stats.avg_s():.1f}s medi)"
+        )
+
     def run(self):
         try:
             with open(self.input_csv, "r", encoding="utf-8", newline="") as f_in:
@@ -530,49 +728,150 @@ class SeoWorker(QThread):
             self.log(f"Totale righe da processare: {total}")
             self.log(f"Delimitatore rilevato: {getattr(dialect, 'delimiter', ';')!r}")
 
-            with open(self.output_csv, "w", encoding="utf-8", newline="") as f_out:
-                writer = csv.writer(
-                    f_out,
-                    delimiter=getattr(dialect, "delimiter", ";"),
-                    quotechar=getattr(dialect, "quotechar", '"'),
-                    quoting=csv.QUOTE_MINIMAL
-                )
-
-                writer.writerow(header)
-
-                for i, row in enumerate(data_rows, start=1):
-                    if self._stop:
-                        self.log("⛔ Interrotto dall'utente.")
-                        self.finished_signal.emit("Interrotto dall'utente.")
-                        return
-
-                    row = ensure_len(row, max_out_index)
-
-                    nome = row[COL_TITLE_IN] if len(row) > COL_TITLE_IN else ""
-                    descr = row[COL_DESC_IN] if len(row) > COL_DESC_IN else ""
-
-                    title, desc = genera_meta(nome, descr, self.prompt_template, logger=self.log)
-
-                    # ✅ focus keyphrase derivata dal nome prodotto
-                    focuskw = derive_focuskw(nome)
+            # ✅ tutte le righe escono con le colonne Yoast, anche quelle non elaborate
+            for row in data_rows:
+                ensure_len(row, max_out_index)
 
-                    # ✅ forza keyphrase dentro title + metadesc
-                    title = ensure_keyphrase_in_title(title, focuskw)
-                    desc  = ensure_keyphrase_in_metadesc(desc, focuskw)
+            # ✅ priorità di elaborazione per riga
+            published_idx  = find_col(header, PUBLISHED_HEADER)
+            in_stock_idx   = find_col(header, IN_STOCK_HEADER)
+            categories_idx = find_col(header, CATEGORIES_HEADER)
 
-                    row[yoast_focuskw_idx] = focuskw
-                    row[yoast_title_idx]   = title
-                    row[yoast_desc_idx]    = desc
-
-                    # ✅ mette la keyphrase come primo paragrafo nella descrizione lunga
-                    current_long_desc = row[long_desc_idx] if len(row) > long_desc_idx else ""
-                    row[long_desc_idx] = ensure_keyphrase_paragraph_at_start(current_long_desc, focuskw)
-
-
-                    writer.writerow(row)
+            priorities = [
+                row_priority(r, published_idx, in_stock_idx, categories_idx, self.key_categories)
+                for r in data_rows
+            ]
 
-                    if i % 10 == 0:
-                        self.log(f"Righe processate: {i}/{total}")
+            if self.key_categories:
+                self.log(f"Categorie prioritarie: {', '.join(self.key_categories)}")
+            if self.time_budget_s:
+                self.log(f"Budget tempo: {self.time_budget_s / 60:g} minuti")
+
+            self.log(f"Pipeline: {PRIMARY_CONCURRENCY} generazioni + {REWRITE_CONCURRENCY} riscritture in parallelo")
+
+            def finalize_row(row, title, desc):
+                nome = row[COL_TITLE_IN] if len(row) > COL_TITLE_IN else ""
+
+                # ✅ focus keyphrase derivata dal nome prodotto
+                focuskw = derive_focuskw(nome)
+
+                # ✅ forza keyphrase dentro title + metadesc
+                title = ensure_keyphrase_in_title(title, focuskw)
+                desc  = ensure_keyphrase_in_metadesc(desc, focuskw)
+
+                row[yoast_focuskw_idx] = focuskw
+                row[yoast_title_idx]   = title
+                row[yoast_desc_idx]    = desc
+
+                # ✅ mette la keyphrase come primo paragrafo nella descrizione lunga
+                current_long_desc = row[long_desc_idx] if len(row) > long_desc_idx else ""
+                row[long_desc_idx] = ensure_keyphrase_paragraph_at_start(current_long_desc, focuskw)
+
+            # ✅ due stadi con code a priorità separate: le riscritture non bloccano le generazioni
+            # ordine per priorità; a parità l'indice j mantiene l'ordine del file
+            primary_q = queue.PriorityQueue()
+            for j in range(total):
+                primary_q.put((-priorities[j], j))
+            rewrite_q = queue.PriorityQueue()
+            done_q = queue.Queue()
+            primary_done = threading.Event()
+            primary_stats = StageStats()
+            rewrite_stats = StageStats()
+
+            start_run = time.time()
+            self._deadline = start_run + self.time_budget_s if self.time_budget_s else None
+            done = 0
+            stop_reason = ""
+            last_checkpoint = 0
+            write_error = None
+
+            try:
+                primary_threads = [
+                    threading.Thread(
+                        target=self._guarded,
+                        args=(self._primary_stage, data_rows, primary_q, rewrite_q, done_q, primary_stats),
+                        daemon=True,
+                    )
+                    for _ in range(PRIMARY_CONCURRENCY)
+                ]
+                rewrite_threads = [
+                    threading.Thread(
+                        target=self._guarded,
+                        args=(self._rewrite_stage, data_rows, rewrite_q, done_q, primary_done, rewrite_stats),
+                        daemon=True,
+                    )
+                    for _ in range(REWRITE_CONCURRENCY)
+                ]
+                for t in primary_threads + rewrite_threads:
+                    t.start()
+
+                # ✅ le righe già nel range arrivano qui subito, senza attendere le riscritture
+                while True:
+                    if not primary_done.is_set() and not any(t.is_alive() for t in primary_threads):
+                        primary_done.set()
+                    try:
+                        j, title, desc = done_q.get(timeout=0.2)
+                    except queue.Empty:
+                        if primary_done.is_set() and not any(t.is_alive() for t in rewrite_threads) and done_q.empty():
+                            break
+                        continue
+
+                    finalize_row(data_rows[j], title, desc)
+
+                    done += 1
+                    if done % 10 == 0:
+                        self.log(f"Righe processate: {done}/{total}")
+                        self.log(self._pipeline_status(
+                            primary_q, rewrite_q, primary_stats, rewrite_stats, time.time() - start_run
+                        ))
+
+                    # ✅ checkpoint periodico: il lavoro fatto non si perde se il processo muore.
+                    # Best-effort: se il file è bloccato (es. aperto in Excel) si riprova al prossimo.
+                    if done - last_checkpoint >= CHECKPOINT_EVERY:
+                        try:
+                            self._write_output(header, data_rows, dialect)
+                        except OSError as e:
+                            self.log(f"⚠ Checkpoint non salvato (file aperto in un altro programma?): {e}")
+                        last_checkpoint = done
+
+                if self._errors:
+                    # l'output parziale viene scritto nel finally prima di error_signal
+                    self.log(f"Errore in uno stadio dopo {done}/{total} righe: salvo l'output parziale.")
+                    raise self._errors[0]
+
+                self.log(self._pipeline_status(
+                    primary_q, rewrite_q, primary_stats, rewrite_stats, time.time() - start_run
+                ))
+                if self._rewrites_skipped:
+                    self.log(f"Riscritture saltate (stop/budget): {self._rewrites_skipped}")
+
+                if self._stop:
+                    self.log("⛔ Interrotto dall'utente.")
+                    stop_reason = "Interrotto dall'utente."
+                elif done < total:
+                    self.log(f"⏱ Budget tempo esaurito dopo {done}/{total} righe ({(time.time() - start_run) / 60:.1f} minuti).")
+                    stop_reason = "Budget tempo esaurito."
+            except Exception:
+                # ferma gli stadi ancora attivi: nessuna nuova chiamata dopo un errore
+                self._stop = True
+                raise
+            finally:
+                # ✅ output sempre valido (anche su stop/errore), nell'ordine del file:
+                # le righe non elaborate passano invariate
+                try:
+                    self._write_output(header, data_rows, dialect)
+                except Exception as e:
+                    # non mascherare un eventuale errore già in corso: lo si segnala e basta
+                    write_error = e
+                    self.log(f"❌ Impossibile scrivere l'output {self.output_csv}: {e}")
+
+            if write_error is not None:
+                raise write_error
+
+            if stop_reason:
+                self.log(f"Righe elaborate: {done}/{total}, {total - done} lasciate invariate.")
+                self.finished_signal.emit(f"{stop_reason} File generato: {self.output_csv}")
+                return
 
             self.finished_signal.emit(f"Fatto. File generato: {self.output_csv}")
 
@@ -583,6 +882,7 @@ class MainWindow(QWidget):
     def __init__(self):
         super().__init__()
         self.worker = None
+        self.close_requested = False
         self.init_ui()
 
     def init_ui(self):
@@ -609,6 +909,18 @@ class MainWindow(QWidget):
         self.sector_edit.setMinimumHeight(80)
         layout.addWidget(self.sector_edit)
 
+        layout.addWidget(QLabel("Categorie prioritarie (separate da virgola, elaborate per prime):"))
+        self.key_categories_edit = QLineEdit()
+        self.key_categories_edit.setPlaceholderText("es: Raccordi, Oleodinamica > Oli idraulici (nomi interi o percorsi)")
+        layout.addWidget(self.key_categories_edit)
+
+        budget_layout = QHBoxLayout()
+        self.budget_edit = QLineEdit()
+        self.budget_edit.setPlaceholderText("vuoto = nessun limite")
+        budget_layout.addWidget(QLabel("Budget tempo (minuti):"))
+        budget_layout.addWidget(self.budget_edit)
+        layout.addLayout(budget_layout)
+
         btn_layout = QHBoxLayout()
         self.start_btn = QPushButton("Start")
         self.start_btn.clicked.connect(self.start_worker)
@@ -658,11 +970,27 @@ class MainWindow(QWidget):
 
         prompt_template = BASE_PROMPT.format(settore=settore, contesto="{contesto}")
 
+        key_categories = parse_key_categories(self.key_categories_edit.text())
+
+        budget_text = self.budget_edit.text().strip().replace(",", ".")
+        time_budget_s = None
+        if budget_text:
+            try:
+                time_budget_s = float(budget_text) * 60
+            except ValueError:
+                time_budget_s = 0
+            if not math.isfinite(time_budget_s) or time_budget_s <= 0:
+                self.log("⚠ Budget tempo non valido: indica i minuti (es: 480) o lascia vuoto.")
+                return
+
         self.log(f"▶ Avvio elaborazione su: {input_csv}")
         self.log(f"Output: {output_csv}")
         self.log(f"Settore/categoria: {settore}")
 
-        self.worker = SeoWorker(input_csv, output_csv, prompt_template)
+        self.worker = SeoWorker(
+            input_csv, output_csv, prompt_template,
+            key_categories=key_categories, time_budget_s=time_budget_s
+        )
         self.worker.log_signal.connect(self.log)
         self.worker.finished_signal.connect(self.on_finished)
         self.worker.error_signal.connect(self.on_error)
@@ -671,6 +999,17 @@ class MainWindow(QWidget):
         self.stop_btn.setEnabled(True)
         self.worker.start()
 
+    def closeEvent(self, event):
+        # chiusura a elaborazione in corso: stop senza bloccare la GUI, la finestra si chiude
+        # da on_finished/on_error dopo la scrittura dell'output parziale
+        if self.worker is not None and self.worker.isRunning():
+            self.close_requested = True
+            self.worker.stop()
+            self.log("⏳ Chiusura richiesta: attendo la fine della chiamata in corso…")
+            event.ignore()
+            return
+        event.accept()
+
     def stop_worker(self):
         if self.worker is not None:
             self.worker.stop()
@@ -681,12 +1020,16 @@ class MainWindow(QWidget):
         self.start_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
         self.worker = None
+        if self.close_requested:
+            self.close()
 
     def on_error(self, msg: str):
         self.log(f"❌ Errore: {msg}")
         self.start_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
         self.worker = None
+        if self.close_requested:
+            self.close()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)